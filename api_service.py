@@ -1,21 +1,41 @@
 import os
 import json
+import asyncio
+import hashlib
+import itertools
 import logging
+import queue
+import re
+import threading
 import pyodbc
 import pandas as pd
 import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
+from decimal import Decimal
 
+import orjson
+import pyarrow as pa
+
+import anyio.to_thread
 from fastapi import FastAPI, Depends, HTTPException, status, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.encoders import jsonable_encoder
 
+import bcrypt
+from cachetools import TTLCache
 from pydantic import BaseModel, Field, SecretStr
 from jose import JWTError, jwt
-from passlib.context import CryptContext
+
+# Connections are pooled by this module, so disable the ODBC driver
+# manager's pool to avoid keeping a second set of idle connections.
+# Must be set before the first connection is opened.
+pyodbc.pooling = False
 
 # Setup logging
 logging.basicConfig(
@@ -29,12 +49,23 @@ API_CONFIG = {
     "SECRET_KEY": os.getenv("API_SECRET_KEY", "your-secret-key-change-in-production"),
     "ALGORITHM": "HS256",
     "ACCESS_TOKEN_EXPIRE_MINUTES": 30,
+    "TOKEN_CACHE_SECONDS": 20,
+    "STREAM_BATCH_SIZE": 5000,
+    "THREADPOOL_SIZE": int(os.getenv("API_THREADPOOL_SIZE", "100")),
     "DATABASE_CONFIG": {
         "server": os.getenv("DB_SERVER", "zoidberg-ro"),
         "database": os.getenv("DB_DATABASE", "BusinessAnalytics"),
         "username": os.getenv("DB_USERNAME", "svc_powerautomate04"),
         "password": os.getenv("DB_PASSWORD", "Q7Tqon6nqoIiZ7c4Md"),
-    }
+        # SQL Server accepts network packet sizes between 512 and 32767 bytes
+        "packet_size": int(os.getenv("DB_PACKET_SIZE", "32767")),
+    },
+    "POOL_CONFIG": {
+        "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+        "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+        "timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "statement_cache_size": int(os.getenv("DB_STATEMENT_CACHE_SIZE", "32")),
+    },
 }
 
 # Hardcoded user for demo (in production, use a database)
@@ -44,11 +75,39 @@ DEMO_USER = {
                                 "$2b$12$EixZaYVK1fsbw1ZfbX3OXePaWxn96p36WQoeG6Lruj3vjPGga31lW"),  # "password"
     "disabled": False,
 }
+DEMO_PWD_HASH_BYTES = DEMO_USER["hashed_password"].encode()
 
 # Security utilities
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Recently validated tokens, keyed by SHA-256 of the raw token
+_jwt_cache = TTLCache(maxsize=10000, ttl=API_CONFIG["TOKEN_CACHE_SECONDS"])
+
+# Schema metadata changes rarely, so cache it briefly
+_schema_cache = TTLCache(maxsize=8, ttl=300)
+_db_info_cache = TTLCache(maxsize=8, ttl=3600)
+
+# Recent password checks, keyed by (username, SHA-256 of the password)
+_login_cache = TTLCache(maxsize=1024, ttl=60)
+_login_cache_lock = threading.Lock()
+
+# Identical read-only queries currently executing, keyed by query + params hash
+_inflight: Dict[bytes, asyncio.Future] = {}
+# A single SELECT statement that does not write with SELECT ... INTO and
+# gives every caller the same answer: no sequence values, random or GUID
+# functions, and no user-defined functions (always called by schema-qualified
+# name in SQL Server), whose determinism is unknown
+_READ_ONLY_RE = re.compile(
+    r"^\s*SELECT\b(?!.*\bINTO\b)(?!.*;\s*\S)"
+    r"(?!.*\bNEXT\s+VALUE\s+FOR\b)"
+    r"(?!.*\b(?:NEWID|NEWSEQUENTIALID|RAND|CRYPT_GEN_RANDOM)\s*\()"
+    r"(?!.*\.\s*(?:\w+|\[[^\]]+\])\s*\()",
+    re.IGNORECASE | re.DOTALL,
+)
+
+# Media type for query results sent as an Arrow IPC stream
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
 # Pydantic models
 class Token(BaseModel):
     access_token: str
@@ -66,7 +125,8 @@ class UserInDB(User):
 
 class QueryRequest(BaseModel):
     query: str = Field(..., description="SQL query to execute")
-    params: Optional[Dict[str, Any]] = Field(default=None, description="Parameters for SQL query")
+    # pyodbc only binds positional (?) parameters, so values are sent in order
+    params: Optional[List[Any]] = Field(default=None, description="Values for the query's ? placeholders, in order")
     
 class QueryResult(BaseModel):
     columns: List[str]
@@ -80,6 +140,11 @@ class ErrorResponse(BaseModel):
     error_type: str
     timestamp: datetime
 
+# Process-wide connection pool (idle connections wait in the queue)
+CONN_POOL = queue.Queue(maxsize=API_CONFIG["POOL_CONFIG"]["max_size"])
+_pool_lock = threading.Lock()
+_pool_stats = {"total": 0, "active": 0}
+
 # Database connection functions
 def get_connection_string():
     """Get database connection string from config"""
@@ -94,11 +159,161 @@ def get_connection_string():
         f"TrustServerCertificate=yes;"
     )
 
-def execute_query(query: str, params: Optional[Dict[str, Any]] = None) -> dict:
+# The configuration is fixed at startup, so build the string once
+CONN_STR = get_connection_string()
+
+# ODBC connection attribute, must be set before the connection is opened
+SQL_ATTR_PACKET_SIZE = 112
+
+class PooledConnection:
+    """
+    A pooled pyodbc connection with a per-connection cursor cache.
+    
+    pyodbc keeps a statement prepared while the same cursor re-executes the
+    same SQL, so reusing one cursor per query text lets parameterized
+    queries skip the prepare round-trip.
+    """
+    
+    def __init__(self, conn):
+        self.conn = conn
+        self.stmt_cache = OrderedDict()
+    
+    def cursor(self):
+        return self.conn.cursor()
+    
+    def cursor_for(self, query: str):
+        """Return the cached cursor for this query text, creating it if needed"""
+        cursor = self.stmt_cache.get(query)
+        if cursor is not None:
+            self.stmt_cache.move_to_end(query)
+            return cursor
+        cursor = self.conn.cursor()
+        self.stmt_cache[query] = cursor
+        if len(self.stmt_cache) > API_CONFIG["POOL_CONFIG"]["statement_cache_size"]:
+            _, evicted = self.stmt_cache.popitem(last=False)
+            evicted.close()
+        return cursor
+    
+    def getinfo(self, info_type):
+        return self.conn.getinfo(info_type)
+    
+    def close(self):
+        self.stmt_cache.clear()
+        self.conn.close()
+
+def _create_connection():
+    """Open a new database connection for the pool"""
+    return PooledConnection(pyodbc.connect(
+        CONN_STR,
+        autocommit=True,
+        attrs_before={SQL_ATTR_PACKET_SIZE: API_CONFIG["DATABASE_CONFIG"]["packet_size"]},
+    ))
+
+def _is_alive(conn) -> bool:
+    """Cheap liveness probe for a pooled connection"""
+    try:
+        conn.getinfo(pyodbc.SQL_DATA_SOURCE_READ_ONLY)
+        return True
+    except pyodbc.Error:
+        return False
+
+def _discard_conn(conn):
+    """Close a connection and release its slot in the pool"""
+    try:
+        conn.close()
+    except pyodbc.Error:
+        pass
+    with _pool_lock:
+        _pool_stats["total"] -= 1
+
+def _get_conn():
+    """
+    Acquire a connection from the pool, opening a new one while the pool is
+    below its maximum size. Dead connections are discarded and replaced.
+    """
+    while True:
+        try:
+            conn = CONN_POOL.get_nowait()
+        except queue.Empty:
+            with _pool_lock:
+                can_grow = _pool_stats["total"] < API_CONFIG["POOL_CONFIG"]["max_size"]
+                if can_grow:
+                    _pool_stats["total"] += 1
+            if can_grow:
+                try:
+                    conn = _create_connection()
+                except Exception:
+                    with _pool_lock:
+                        _pool_stats["total"] -= 1
+                    raise
+            else:
+                try:
+                    conn = CONN_POOL.get(timeout=API_CONFIG["POOL_CONFIG"]["timeout"])
+                except queue.Empty:
+                    raise HTTPException(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail="Database connection pool exhausted",
+                    )
+                if not _is_alive(conn):
+                    _discard_conn(conn)
+                    continue
+        else:
+            if not _is_alive(conn):
+                _discard_conn(conn)
+                continue
+        with _pool_lock:
+            _pool_stats["active"] += 1
+        return conn
+
+def _put_conn(conn, discard: bool = False):
+    """Return a connection to the pool, or close it if it is broken"""
+    with _pool_lock:
+        _pool_stats["active"] -= 1
+    if discard:
+        _discard_conn(conn)
+        return
+    try:
+        CONN_POOL.put_nowait(conn)
+    except queue.Full:
+        _discard_conn(conn)
+
+@contextmanager
+def pooled_connection():
+    """
+    Context manager to borrow a connection from the pool.
+    Connections that fail with connection-level errors are not reused.
+    """
+    conn = _get_conn()
+    discard = False
+    try:
+        yield conn
+    except (pyodbc.OperationalError, pyodbc.InterfaceError):
+        discard = True
+        raise
+    finally:
+        _put_conn(conn, discard=discard)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def _log_query(query: str):
+    """Log a query (removing sensitive data)"""
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    sanitized_query = _WHITESPACE_RE.sub(" ", query).strip()
+    if len(sanitized_query) > 100:
+        sanitized_query = sanitized_query[:100] + "..."
+    logger.info("Executing query: %s", sanitized_query)
+
+def _discard_pending_results(cursor):
+    """Skip any result sets left unread on a cursor"""
+    while cursor.nextset():
+        pass
+
+def execute_query(query: str, params: Optional[List[Any]] = None) -> dict:
     """
     Execute a SQL query and return results with metadata
     """
-    start_time = time.time()
+    start_time = time.perf_counter()
     result = {
         "columns": [],
         "data": [],
@@ -108,42 +323,54 @@ def execute_query(query: str, params: Optional[Dict[str, Any]] = None) -> dict:
     }
     
     try:
-        conn_str = get_connection_string()
+        _log_query(query)
         
-        # Log query (removing sensitive data)
-        sanitized_query = query.replace("\n", " ").strip()
-        if len(sanitized_query) > 100:
-            sanitized_query = sanitized_query[:100] + "..."
-        logger.info(f"Executing query: {sanitized_query}")
-        
-        with pyodbc.connect(conn_str) as conn:
-            cursor = conn.cursor()
+        with pooled_connection() as conn:
+            # Only parameterized queries are re-run with the same text, so
+            # only they get a cached cursor that keeps the statement prepared
+            cursor = conn.cursor_for(query) if params else conn.cursor()
             
-            # Execute query with or without parameters
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            
-            # Get column names if we have a result set
-            if cursor.description:
-                result["columns"] = [column[0] for column in cursor.description]
+            try:
+                # Execute query with or without parameters
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
                 
-                # Fetch data and convert to list of lists (rows)
-                rows = cursor.fetchall()
-                result["data"] = [
-                    [
-                        # Convert non-serializable types to strings
-                        str(cell) if isinstance(cell, (datetime, bytes)) else cell
-                        for cell in row
+                # Get column names if we have a result set
+                if cursor.description:
+                    result["columns"] = [column[0] for column in cursor.description]
+                    
+                    # Fetch data and convert to list of lists (rows)
+                    rows = cursor.fetchall()
+                    # Datetimes are serialized natively by orjson, bytes are not.
+                    # Column types are known from the description, so only the
+                    # binary columns are visited instead of type-checking every cell
+                    binary_columns = [
+                        i for i, column in enumerate(cursor.description)
+                        if column[1] in (bytes, bytearray)
                     ]
-                    for row in rows
-                ]
-                result["rows_affected"] = len(rows)
-            else:
-                # For non-SELECT queries (INSERT, UPDATE, DELETE)
-                result["rows_affected"] = cursor.rowcount
+                    data = [list(row) for row in rows]
+                    for i in binary_columns:
+                        for row in data:
+                            if row[i] is not None:
+                                row[i] = str(row[i])
+                    result["data"] = data
+                    result["rows_affected"] = len(rows)
+                else:
+                    # For non-SELECT queries (INSERT, UPDATE, DELETE)
+                    result["rows_affected"] = cursor.rowcount
+            finally:
+                # A batch may leave further result sets pending, which would
+                # keep the connection busy once it is back in the pool.
+                # Errors here must not mask the original one.
+                try:
+                    _discard_pending_results(cursor)
+                except pyodbc.Error:
+                    pass
                 
+    except HTTPException:
+        raise
     except Exception as e:
         # Log the error and re-raise as HTTPException
         logger.error(f"Database error: {str(e)}")
@@ -153,16 +380,146 @@ def execute_query(query: str, params: Optional[Dict[str, Any]] = None) -> dict:
         )
     finally:
         # Calculate execution time
-        result["execution_time"] = time.time() - start_time
+        result["execution_time"] = time.perf_counter() - start_time
     
     return result
 
+def _json_default(obj):
+    """Serialize values orjson does not handle natively"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, bytes):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+class QueryJSONResponse(ORJSONResponse):
+    """
+    ORJSONResponse that also handles Decimal and bytes values, so query
+    results can be returned without jsonable_encoder or model validation
+    """
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            default=_json_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+        )
+
+def _arrow_column(values) -> "pa.Array":
+    """
+    Build an Arrow array holding the same values the JSON encoding produces,
+    so clients get the same dtypes from either format: decimals become
+    floats (as in _json_default) and dates and times become ISO strings
+    (as orjson writes them).
+    """
+    sample = next((value for value in values if value is not None), None)
+    if isinstance(sample, Decimal):
+        return pa.array([None if value is None else float(value) for value in values], type=pa.float64())
+    if hasattr(sample, "isoformat"):
+        return pa.array([None if value is None else value.isoformat() for value in values], type=pa.string())
+    return pa.array(values)
+
+def result_to_arrow(result: dict) -> Optional[bytes]:
+    """
+    Serialize an execute_query result as an Arrow IPC stream, or return None
+    when a column's values cannot be inferred as a single Arrow type
+    """
+    columns = list(zip(*result["data"])) if result["data"] else [()] * len(result["columns"])
+    try:
+        arrays = [_arrow_column(column) for column in columns]
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        # e.g. sql_variant columns holding values of different types
+        logger.info(f"Falling back to JSON, result is not representable as Arrow: {str(e)}")
+        return None
+    table = pa.Table.from_arrays(arrays, names=result["columns"])
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def stream_query(query: str, params: Optional[List[Any]] = None):
+    """
+    Execute a SQL query and yield the results as NDJSON lines.
+    
+    The first line is a header with the column names; each following line is
+    one row. Rows are fetched in batches so the full result set is never held
+    in memory. Database errors become HTTPExceptions, after the connection
+    pool has seen them so broken connections are discarded.
+    """
+    _log_query(query)
+    try:
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+            cursor.arraysize = API_CONFIG["STREAM_BATCH_SIZE"]
+            try:
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                
+                if not cursor.description:
+                    yield orjson.dumps({"columns": [], "rows_affected": cursor.rowcount}) + b"\n"
+                    return
+                
+                yield orjson.dumps({"columns": [column[0] for column in cursor.description]}) + b"\n"
+                while True:
+                    rows = cursor.fetchmany()
+                    if not rows:
+                        break
+                    yield b"".join(
+                        orjson.dumps(tuple(row), default=_json_default) + b"\n" for row in rows
+                    )
+            finally:
+                # Frees any unread rows, e.g. when the client disconnects
+                # mid-stream. Errors here must not mask the original one.
+                try:
+                    cursor.close()
+                except pyodbc.Error:
+                    pass
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Database error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}",
+        )
+
+async def execute_query_coalesced(query: str, params: Optional[List[Any]] = None) -> dict:
+    """
+    Run execute_query in the threadpool, sharing a single database round-trip
+    between concurrent callers of the same read-only query. Statements that
+    may write are always executed individually.
+    """
+    if not _READ_ONLY_RE.match(query):
+        return await run_in_threadpool(execute_query, query, params)
+    
+    key = hashlib.blake2b(
+        (query + json.dumps(params, sort_keys=True, default=str)).encode(),
+        digest_size=16,
+    ).digest()
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(run_in_threadpool(execute_query, query, params))
+        _inflight[key] = task
+        
+        def _done(finished):
+            _inflight.pop(key, None)
+            # Mark the exception as retrieved in case every caller went away
+            if not finished.cancelled():
+                finished.exception()
+        
+        task.add_done_callback(_done)
+    # Shield so one cancelled request does not cancel the query for the others
+    return await asyncio.shield(task)
+
 # Authentication functions
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    if isinstance(hashed_password, str):
+        hashed_password = hashed_password.encode()
+    return bcrypt.checkpw(plain_password.encode(), hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
 
 def get_user(username: str):
     # In a real app, fetch from database
@@ -174,7 +531,15 @@ def authenticate_user(username: str, password: str):
     user = get_user(username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    # Repeated logins within the cache TTL skip the bcrypt work factor
+    cache_key = (username, hashlib.sha256(password.encode()).digest())
+    with _login_cache_lock:
+        verified = _login_cache.get(cache_key)
+    if verified is None:
+        verified = verify_password(password, DEMO_PWD_HASH_BYTES)
+        with _login_cache_lock:
+            _login_cache[cache_key] = verified
+    if not verified:
         return False
     return user
 
@@ -189,6 +554,12 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
+    cache_key = hashlib.sha256(token.encode()).digest()
+    cached = _jwt_cache.get(cache_key)
+    # Never serve a cached user past the token's own expiry
+    if cached is not None and cached[1] > time.time():
+        return cached[0]
+    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -201,10 +572,12 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
             raise credentials_exception
         token_data = TokenData(username=username)
     except JWTError:
+        _jwt_cache.pop(cache_key, None)
         raise credentials_exception
     user = get_user(username=token_data.username)
     if user is None:
         raise credentials_exception
+    _jwt_cache[cache_key] = (user, payload.get("exp", 0))
     return user
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)):
@@ -217,6 +590,7 @@ app = FastAPI(
     title="SQL Server API Proxy",
     description="Secure API proxy for SQL Server database access",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
 # Add CORS middleware
@@ -228,16 +602,46 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def configure_threadpool():
+    """Raise the worker thread limit used for blocking database calls"""
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = API_CONFIG["THREADPOOL_SIZE"]
+
+@app.on_event("startup")
+def fill_connection_pool():
+    """Open the minimum number of pooled connections before serving requests"""
+    for _ in range(API_CONFIG["POOL_CONFIG"]["min_size"]):
+        try:
+            with _pool_lock:
+                _pool_stats["total"] += 1
+            CONN_POOL.put_nowait(_create_connection())
+        except Exception as e:
+            with _pool_lock:
+                _pool_stats["total"] -= 1
+            logger.warning(f"Could not pre-fill connection pool: {str(e)}")
+            break
+
+@app.on_event("shutdown")
+def close_connection_pool():
+    """Close all idle pooled connections"""
+    while True:
+        try:
+            conn = CONN_POOL.get_nowait()
+        except queue.Empty:
+            break
+        _discard_conn(conn)
+
 # Exception handler
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     """Custom exception handler for better error formatting"""
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={
             "detail": exc.detail,
             "error_type": "HTTPException",
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": datetime.now(),
         },
     )
 
@@ -245,19 +649,19 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 async def general_exception_handler(request: Request, exc: Exception):
     """Catch-all exception handler"""
     logger.error(f"Unhandled exception: {str(exc)}")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={
             "detail": f"Internal server error: {str(exc)}",
             "error_type": type(exc).__name__,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": datetime.now(),
         },
     )
 
 # API endpoints
 @app.post("/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    """Endpoint to obtain an access token"""
+def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
+    """Endpoint to obtain an access token (sync, so bcrypt runs in the threadpool)"""
     user = authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(
@@ -274,17 +678,38 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
 @app.get("/api/health")
 async def health_check():
     """Simple health check endpoint (no auth required)"""
-    return {"status": "ok", "timestamp": datetime.now().isoformat()}
+    return {"status": "ok", "timestamp": datetime.now()}
+
+@app.get("/api/pool-health")
+async def pool_health():
+    """Connection pool statistics (no auth required)"""
+    with _pool_lock:
+        total = _pool_stats["total"]
+        active = _pool_stats["active"]
+    return {
+        "active": active,
+        "idle": CONN_POOL.qsize(),
+        "total": total,
+        "min_size": API_CONFIG["POOL_CONFIG"]["min_size"],
+        "max_size": API_CONFIG["POOL_CONFIG"]["max_size"],
+    }
 
-@app.post("/api/query", response_model=QueryResult)
+@app.post("/api/query", responses={200: {"model": QueryResult}})
 async def run_sql_query(
     query_req: QueryRequest,
+    request: Request,
     current_user: User = Depends(get_current_active_user)
 ):
-    """Execute a SQL query and return results"""
+    """Execute a SQL query and return results, as Arrow IPC if the client accepts it"""
     try:
-        result = execute_query(query_req.query, query_req.params)
-        return result
+        # pyodbc blocks, so run it in the worker threadpool
+        result = await execute_query_coalesced(query_req.query, query_req.params)
+        if result["columns"] and ARROW_STREAM_MEDIA_TYPE in request.headers.get("accept", ""):
+            body = await run_in_threadpool(result_to_arrow, result)
+            if body is not None:
+                return Response(content=body, media_type=ARROW_STREAM_MEDIA_TYPE)
+        # Returned directly to skip re-validating every cell against QueryResult
+        return QueryJSONResponse(content=result)
     except HTTPException as e:
         # Re-raise HTTPExceptions
         raise e
@@ -296,15 +721,48 @@ async def run_sql_query(
             detail=f"Error executing query: {str(e)}",
         )
 
-@app.get("/api/tables", response_model=QueryResult)
+@app.post("/api/query-batch", responses={200: {"model": List[QueryResult]}})
+async def run_sql_query_batch(
+    query_reqs: List[QueryRequest],
+    current_user: User = Depends(get_current_active_user)
+):
+    """Execute independent SQL queries concurrently on separate pooled connections"""
+    results = await asyncio.gather(
+        *[run_in_threadpool(execute_query, q.query, q.params) for q in query_reqs]
+    )
+    return QueryJSONResponse(content=results)
+
+@app.post("/api/query/stream")
+async def stream_sql_query(
+    query_req: QueryRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Execute a SQL query and stream the results as NDJSON"""
+    rows = stream_query(query_req.query, query_req.params)
+    # Produce the header eagerly so query errors still map to an error status
+    header = await run_in_threadpool(next, rows)
+    return StreamingResponse(
+        itertools.chain([header], rows),
+        media_type="application/x-ndjson",
+    )
+
+@app.get("/api/tables", responses={200: {"model": QueryResult}})
 async def get_tables(current_user: User = Depends(get_current_active_user)):
     """Get list of tables in the database"""
+    headers = {"Cache-Control": "max-age=300"}
+    if "tables" in _schema_cache:
+        return QueryJSONResponse(content=_schema_cache["tables"], headers=headers)
     query = "SELECT TABLE_SCHEMA, TABLE_NAME, TABLE_TYPE FROM INFORMATION_SCHEMA.TABLES ORDER BY TABLE_SCHEMA, TABLE_NAME"
-    return execute_query(query)
+    result = await run_in_threadpool(execute_query, query)
+    _schema_cache["tables"] = result
+    return QueryJSONResponse(content=result, headers=headers)
 
-@app.get("/api/database-info", response_model=QueryResult)
+@app.get("/api/database-info", responses={200: {"model": QueryResult}})
 async def get_database_info(current_user: User = Depends(get_current_active_user)):
     """Get database metadata information"""
+    headers = {"Cache-Control": "max-age=3600"}
+    if "database_info" in _db_info_cache:
+        return QueryJSONResponse(content=_db_info_cache["database_info"], headers=headers)
     query = """
     SELECT 
         @@SERVERNAME AS ServerName,
@@ -312,12 +770,23 @@ async def get_database_info(current_user: User = Depends(get_current_active_user
         @@VERSION AS SqlServerVersion,
         SERVERPROPERTY('ProductVersion') AS ProductVersion
     """
-    return execute_query(query)
+    result = await run_in_threadpool(execute_query, query)
+    _db_info_cache["database_info"] = result
+    return QueryJSONResponse(content=result, headers=headers)
 
 # Main entry point
 if __name__ == "__main__":
     import uvicorn
     
-    # Run the API server
-    uvicorn.run("api_service:app", host="0.0.0.0", port=8000, reload=True)
+    # Run the API server. uvloop and httptools are picked up automatically
+    # when installed (uvicorn[standard]); each worker keeps its own pool.
+    uvicorn.run(
+        "api_service:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="auto",
+        http="auto",
+        workers=int(os.getenv("API_WORKERS", os.cpu_count() or 1)),
+        access_log=False,
+    )
 
@@ -1,11 +1,28 @@
 import streamlit as st
 import pyodbc
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import io
+import os
 import time
+import re
+import random
+import functools
+import concurrent.futures
+from decimal import Decimal
+import queue
+import threading
 import socket
 import platform
 from contextlib import contextmanager
 
+import query_cache
+
+# Connections are pooled by ConnectionPool below; disable pyodbc's
+# driver-manager pooling so closed connections are really closed
+pyodbc.pooling = False
+
 # Set page configuration
 st.set_page_config(
     page_title="SQL Server Data Explorer",
@@ -20,39 +37,157 @@ This application connects to a SQL Server database and allows you to run queries
 Connection information is securely stored in .streamlit/secrets.toml.
 """)
 
+def get_connection_string(trust_server_certificate=False):
+    """
+    Build the SQL Server connection string from secrets. Connections are
+    encrypted and verify the server certificate unless trust_server_certificate
+    is set (needed for servers with self-signed certificates).
+    """
+    return (
+        f"DRIVER={{ODBC Driver 17 for SQL Server}};"
+        f"SERVER={st.secrets['sql']['server']};"
+        f"DATABASE={st.secrets['sql']['database']};"
+        f"UID={st.secrets['sql']['username']};"
+        f"PWD={st.secrets['sql']['password']};"
+        f"Connection Timeout=30;"
+        f"Encrypt=yes;"
+        f"TrustServerCertificate={'yes' if trust_server_certificate else 'no'};"
+    )
+
+def is_certificate_error(error):
+    """Check whether a connection error was caused by TLS certificate validation"""
+    error_msg = str(error).lower()
+    return "certificate" in error_msg or "ssl provider" in error_msg
+
+class ConnectionPool:
+    """
+    Bounded pool of pyodbc connections shared by all Streamlit sessions.
+    
+    Idle connections are kept in a queue together with the time they were
+    returned. Connections idle for longer than validate_after seconds are
+    pinged before reuse, and broken connections are replaced.
+    """
+    
+    def __init__(self, conn_str, min_size=1, max_size=5, timeout=30, validate_after=60):
+        self.conn_str = conn_str
+        self.max_size = max_size
+        self.timeout = timeout
+        self.validate_after = validate_after
+        self._idle = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._size = 0
+        # Per-connection cursors keyed by SQL text, see cursor_for()
+        self._cursor_caches = {}
+        self.driver_ver = None
+        for _ in range(min_size):
+            self._reserve()
+            conn = self._connect()
+            # Looked up once here rather than on every reconnect or render
+            if self.driver_ver is None:
+                self.driver_ver = conn.getinfo(pyodbc.SQL_DRIVER_VER)
+            self._idle.put_nowait((conn, time.monotonic()))
+    
+    def _reserve(self):
+        """Claim a slot for a new connection; returns False when the pool is full"""
+        with self._lock:
+            if self._size >= self.max_size:
+                return False
+            self._size += 1
+            return True
+    
+    def _connect(self):
+        try:
+            return pyodbc.connect(self.conn_str, autocommit=True)
+        except Exception:
+            with self._lock:
+                self._size -= 1
+            raise
+    
+    def _discard(self, conn):
+        self._cursor_caches.pop(id(conn), None)
+        try:
+            conn.close()
+        except pyodbc.Error:
+            pass
+        with self._lock:
+            self._size -= 1
+    
+    def cursor_for(self, conn, sql, max_cached=32):
+        """
+        Return a cursor on conn dedicated to this SQL text. pyodbc keeps the
+        statement prepared while a cursor re-executes the same SQL, so
+        repeated parameterized queries skip the prepare step on the server.
+        """
+        cursors = self._cursor_caches.setdefault(id(conn), {})
+        cursor = cursors.get(sql)
+        if cursor is None:
+            if len(cursors) >= max_cached:
+                cursors.pop(next(iter(cursors))).close()
+            cursor = cursors[sql] = conn.cursor()
+        return cursor
+    
+    def _is_alive(self, conn):
+        try:
+            conn.cursor().execute("SELECT 1").fetchall()
+            return True
+        except pyodbc.Error:
+            return False
+    
+    def acquire(self):
+        """Check out a connection, opening a new one if the pool has room"""
+        while True:
+            try:
+                conn, released_at = self._idle.get_nowait()
+            except queue.Empty:
+                if self._reserve():
+                    return self._connect()
+                try:
+                    conn, released_at = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise pyodbc.OperationalError("HYT00", "Timed out waiting for a pooled connection")
+            
+            if time.monotonic() - released_at < self.validate_after or self._is_alive(conn):
+                return conn
+            self._discard(conn)
+    
+    def release(self, conn, broken=False):
+        """Return a connection to the pool, closing it if it is broken"""
+        if broken:
+            self._discard(conn)
+            return
+        try:
+            self._idle.put_nowait((conn, time.monotonic()))
+        except queue.Full:
+            self._discard(conn)
+
 # Initialize connection pool
 # Uses st.cache_resource to only run once and persist connection pool
 @st.cache_resource
 def init_connection_pool():
     """
-    Initialize and return a connection to SQL Server using connection pooling.
+    Initialize and return a pool of connections to SQL Server.
     Credentials are stored securely in .streamlit/secrets.toml.
     """
     try:
-        # Get connection parameters from secrets
-        server = st.secrets["sql"]["server"]
-        database = st.secrets["sql"]["database"]
-        username = st.secrets["sql"]["username"]
-        password = st.secrets["sql"]["password"]
-        
         # Show connection attempt message
-        st.sidebar.info(f"Attempting to connect to server: {server}")
-        
-        # Simplified connection string
-        conn_str = (
-            f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-            f"SERVER={server};"
-            f"DATABASE={database};"
-            f"UID={username};"
-            f"PWD={password};"
-            f"Connection Timeout=30;"
-            f"TrustServerCertificate=yes;"
-        )
+        st.sidebar.info(f"Attempting to connect to server: {st.secrets['sql']['server']}")
         
-        # Create connection with simplified parameters
-        conn = pyodbc.connect(conn_str, autocommit=True)
-        st.sidebar.success(f"Connected successfully. Driver version: {conn.getinfo(pyodbc.SQL_DRIVER_VER)}")
-        return conn
+        # The first connection is opened eagerly so connection errors surface
+        # here. Try a verified TLS connection first and only trust the server
+        # certificate if validation fails; the pool keeps the connection string
+        # that worked, so reconnects skip the failing attempt.
+        pool_size = st.secrets["sql"].get("pool_size", 5)
+        try:
+            pool = ConnectionPool(get_connection_string(), min_size=1, max_size=pool_size)
+        except (pyodbc.OperationalError, pyodbc.InterfaceError) as e:
+            if not is_certificate_error(e):
+                raise
+            pool = ConnectionPool(
+                get_connection_string(trust_server_certificate=True),
+                min_size=1,
+                max_size=pool_size,
+            )
+        return pool
     
     except pyodbc.OperationalError as e:
         error_msg = str(e)
@@ -98,41 +233,237 @@ def get_connection():
     Context manager to safely get and release a connection from the pool.
     Ensures connections are properly closed even if errors occur.
     """
-    connection = init_connection_pool()
+    pool = init_connection_pool()
+    if pool is None:
+        yield None
+        return
+    
+    connection = pool.acquire()
+    broken = False
     try:
         yield connection
+    except (pyodbc.OperationalError, pyodbc.InterfaceError):
+        broken = True
+        raise
     finally:
-        if connection:
-            # Return to pool, don't actually close
-            pass
+        pool.release(connection, broken=broken)
+
+# pandas dtypes for the Python types pyodbc reports in cursor.description.
+# Decimals become floats, matching the previous coerce_float behaviour.
+DTYPE_BY_TYPE_CODE = {
+    int: "Int64",
+    float: "float64",
+    Decimal: "float64",
+    bool: "boolean",
+    str: "string",
+}
+
+def records_to_dataframe(rows, description):
+    """
+    Build a DataFrame column by column, using the dtypes known from the
+    cursor description instead of inferring them from every cell.
+    Columns of other types (dates, binary, ...) are inferred as before.
+    """
+    columns = [column[0] for column in description]
+    if not rows:
+        return pd.DataFrame(columns=columns)
+    
+    arrays = {}
+    for i, values in enumerate(zip(*rows)):
+        dtype = DTYPE_BY_TYPE_CODE.get(description[i][1])
+        try:
+            arrays[i] = pd.array(values, dtype=dtype) if dtype else pd.Series(values)
+        except (TypeError, ValueError):
+            arrays[i] = pd.Series(values)
+    # Built with positional keys so duplicate column names survive
+    df = pd.DataFrame(arrays)
+    df.columns = columns
+    return df
+
+def run_parametrized(conn, sql, params):
+    """Execute a parameterized query on a cursor reused for the same SQL text"""
+    cursor = init_connection_pool().cursor_for(conn, sql)
+    cursor.execute(sql, params)
+    return cursor
+
+def discard_pending_results(cursor):
+    """
+    Skip any rows and result sets left unread on a cursor. Without MARS a
+    SQL Server connection can only have one active result set, so this must
+    run before the connection goes back to the pool.
+    """
+    while cursor.nextset():
+        pass
+
+@st.cache_resource
+def get_query_semaphore():
+    """
+    Process-wide cap on queries running against the server, shared by all
+    sessions, so retries after an outage cannot pile up into a storm.
+    """
+    return threading.BoundedSemaphore(st.secrets["sql"].get("pool_size", 5))
+
+def fetch_dataframe(query, params=None, row_limit=None):
+    """
+    Execute a query once, without retries or UI output, and return the results
+    as a DataFrame. Returns None when no database connection is available.
+    At most row_limit rows are fetched when a limit is given.
+    """
+    with get_query_semaphore():
+        return _fetch_dataframe(query, params, row_limit)
+
+def _fetch_dataframe(query, params, row_limit):
+    with get_connection() as conn:
+        if conn is None:
+            return None
+        
+        # Execute query and fetch results into DataFrame. The cursor is
+        # used directly since pd.read_sql only supports pyodbc through
+        # its generic DBAPI fallback (and warns on every call), and
+        # its description gives the column types up front
+        if params:
+            cursor = run_parametrized(conn, query, params)
+        else:
+            cursor = conn.cursor()
+            cursor.execute(query)
+        try:
+            if cursor.description is None:
+                return pd.DataFrame()
+            rows = cursor.fetchmany(row_limit) if row_limit else cursor.fetchall()
+            return records_to_dataframe(rows, cursor.description)
+        finally:
+            # fetchmany stops early, and batches may hold further result sets.
+            # Errors here must not mask the original one.
+            try:
+                discard_pending_results(cursor)
+            except pyodbc.Error:
+                pass
+
+def partition_bounds(lower, upper, num_partitions):
+    """Split the inclusive integer range [lower, upper] into half-open ranges"""
+    step = max(1, -(-(upper - lower + 1) // num_partitions))
+    return [(lo, min(lo + step, upper + 1)) for lo in range(lower, upper + 1, step)]
+
+@st.cache_data(ttl=600, show_spinner=False)  # Cache for 10 minutes
+def run_partitioned_query(query, params, column, lower, upper, num_partitions, row_limit=None):
+    """
+    Fetch a large result set in parallel by splitting it on ranges of an
+    integer column. Each partition runs on its own pooled connection and the
+    partial results are concatenated. Rows outside [lower, upper] are skipped.
+    Each partition fetches at most row_limit rows, and the combined result is
+    cut to row_limit rows.
+    """
+    quoted_column = "[" + column.replace("]", "]]") + "]"
+    subquery = (
+        f"SELECT * FROM ({query.strip().rstrip(';')}) AS partitioned "
+        f"WHERE {quoted_column} >= ? AND {quoted_column} < ?"
+    )
+    base_params = tuple(params or ())
+    bounds = partition_bounds(lower, upper, num_partitions)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(bounds)) as executor:
+        frames = list(executor.map(lambda b: fetch_dataframe(subquery, base_params + b, row_limit), bounds))
+    if any(frame is None for frame in frames):
+        raise pyodbc.OperationalError("08001", "Unable to establish database connection")
+    result = pd.concat(frames, ignore_index=True)
+    return result.head(row_limit) if row_limit else result
+
+def disk_cached(ttl):
+    """
+    Decorator that persists DataFrame results through query_cache, keyed by
+    the query and the target server/database. Files older than ttl seconds
+    are ignored.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(cache_key, *args, **kwargs):
+            key_source = cache_key + st.secrets["sql"]["server"] + st.secrets["sql"]["database"]
+            cached = query_cache.load_result(key_source, ttl, dtype_backend="pyarrow")
+            if cached is not None:
+                return cached[0]
+            
+            result = func(cache_key, *args, **kwargs)
+            query_cache.save_result(key_source, result)
+            return result
+        return wrapper
+    return decorator
+
+def backoff_delay(retry_count, base=0.25, max_backoff=8.0):
+    """
+    Capped exponential backoff with jitter, so concurrent sessions do not
+    retry against the server in lockstep.
+    """
+    return min(max_backoff, base * (2 ** retry_count)) * random.uniform(0.5, 1.5)
+
+def is_deadlock(error):
+    """Check whether a database error is a deadlock victim error (1205)"""
+    error_msg = str(error)
+    return "40001" in error_msg or "1205" in error_msg or "deadlock" in error_msg.lower()
+
+# Where a TOP clause can be injected into a single SELECT statement
+_SELECT_RE = re.compile(r"^\s*SELECT(\s+(?:DISTINCT|ALL))?\b", re.IGNORECASE)
+# TOP cannot be combined with OFFSET/FETCH, and in a UNION/EXCEPT/INTERSECT
+# it only limits the first branch, so those queries are left alone too
+_NO_LIMIT_RE = re.compile(
+    r"^\s*SELECT(\s+(?:DISTINCT|ALL))?\s+TOP\b|\bINTO\b|;\s*\S"
+    r"|\bOFFSET\b|\bFETCH\s+(?:NEXT|FIRST)\b|\b(?:UNION|EXCEPT|INTERSECT)\b",
+    re.IGNORECASE,
+)
+
+def apply_row_limit(query, row_limit):
+    """
+    Limit a plain SELECT to row_limit rows on the server by injecting a TOP
+    clause. Queries that already use TOP or OFFSET/FETCH, combine results
+    with UNION/EXCEPT/INTERSECT, write with SELECT ... INTO, contain several
+    statements or are not SELECTs are returned unchanged; for those the limit
+    is still enforced while fetching.
+    """
+    if not row_limit or not _SELECT_RE.match(query) or _NO_LIMIT_RE.search(query):
+        return query
+    return _SELECT_RE.sub(lambda m: f"SELECT{m.group(1) or ''} TOP ({int(row_limit)})", query, count=1)
 
 # Run query with error handling and retries
-@st.cache_data(ttl=600)  # Cache for 10 minutes
-def run_query(query):
+def run_query(query, params=None, row_limit=None):
     """
     Execute a SQL query and return the results as a pandas DataFrame.
     
     Args:
         query (str): SQL query to execute
+        params (tuple, optional): Values for the query's ? placeholders
+        row_limit (int, optional): Maximum number of rows to return
         
     Returns:
         pandas.DataFrame: Query results
     
     The function includes retry logic and proper error handling.
-    Results are cached for 10 minutes.
+    Results are cached for 10 minutes, in memory and on disk; queries that
+    differ only in leading or trailing whitespace share a cache entry.
     """
+    query = apply_row_limit(query, row_limit)
+    # Inner whitespace is kept, since it can matter inside comments and literals
+    cache_key = query.strip()
+    if params:
+        cache_key += "\0" + repr(tuple(params))
+    if row_limit:
+        cache_key += f"\0limit={int(row_limit)}"
+    return _run_query_cached(cache_key, query, params, row_limit)
+
+@st.cache_data(ttl=600, show_spinner=False)  # Cache for 10 minutes
+@disk_cached(ttl=600)
+def _run_query_cached(cache_key, _query, _params, _row_limit):
+    """Cached implementation of run_query (only cache_key is hashed)"""
+    query = _query
+    params = _params
+    row_limit = _row_limit
     max_retries = 3
     retry_count = 0
     
     while retry_count < max_retries:
         try:
-            with get_connection() as conn:
-                if conn is None:
-                    st.error("Unable to establish database connection")
-                    return pd.DataFrame()
-                
-                # Execute query and fetch results into DataFrame
-                return pd.read_sql(query, conn)
+            result = fetch_dataframe(query, params, row_limit)
+            if result is None:
+                st.error("Unable to establish database connection")
+                return pd.DataFrame()
+            return result
         
         except pyodbc.OperationalError as e:
             error_msg = str(e)
@@ -141,8 +472,8 @@ def run_query(query):
             # Determine if it's a timeout or a different operational error
             if "HYT00" in error_msg or "timeout" in error_msg.lower():
                 if retry_count < max_retries:
-                    wait_time = 2 ** retry_count  # Exponential backoff
-                    st.warning(f"Query timeout, retrying in {wait_time} seconds ({retry_count}/{max_retries})...")
+                    wait_time = backoff_delay(retry_count)
+                    st.warning(f"Query timeout, retrying in {wait_time:.1f} seconds ({retry_count}/{max_retries})...")
                     time.sleep(wait_time)
                 else:
                     st.error(f"Query timed out after {max_retries} attempts. Try simplifying your query.")
@@ -151,7 +482,7 @@ def run_query(query):
                 # For other operational errors
                 if retry_count < max_retries:
                     st.warning(f"Connection issue, retrying ({retry_count}/{max_retries})...")
-                    time.sleep(1)
+                    time.sleep(backoff_delay(retry_count))
                 else:
                     st.error(f"Failed to execute query after {max_retries} attempts: {error_msg}")
                     return pd.DataFrame()
@@ -160,12 +491,44 @@ def run_query(query):
             # SQL syntax errors - no need to retry
             st.error(f"SQL Error: {str(e)}")
             return pd.DataFrame()
+        
+        except pyodbc.Error as e:
+            # Deadlock victims can simply be retried, with a shorter backoff
+            if not is_deadlock(e):
+                st.error(f"Query Error: {str(e)}")
+                return pd.DataFrame()
+            retry_count += 1
+            if retry_count < max_retries:
+                st.warning(f"Deadlock detected, retrying ({retry_count}/{max_retries})...")
+                time.sleep(backoff_delay(retry_count, base=0.1))
+            else:
+                st.error(f"Query deadlocked after {max_retries} attempts: {str(e)}")
+                return pd.DataFrame()
                 
         except Exception as e:
             st.error(f"Query Error: {str(e)}")
             return pd.DataFrame()
 
+@st.cache_resource
+def get_executor():
+    """Shared worker threads for encoding downloads off the script thread"""
+    return concurrent.futures.ThreadPoolExecutor(max_workers=2)
+
+def to_csv_bytes(df):
+    """
+    Encode a DataFrame as CSV bytes with Arrow's multi-threaded writer,
+    falling back to pandas for columns Arrow cannot convert.
+    """
+    buf = io.BytesIO()
+    try:
+        pa_csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), buf)
+    except (pa.ArrowException, TypeError, ValueError):
+        buf = io.BytesIO()
+        df.to_csv(buf, index=False)
+    return buf.getvalue()
+
 # Display diagnostic information
+@st.cache_data  # Host details do not change while the app is running
 def get_diagnostic_info():
     """Collect system information for diagnostics"""
     info = {
@@ -183,22 +546,44 @@ def get_diagnostic_info():
 st.sidebar.header("Connection Information")
 connection_status = st.sidebar.empty()
 
+# Bound result sizes so a stray SELECT * cannot exhaust memory
+row_limit = st.sidebar.number_input(
+    "Row limit",
+    min_value=0,
+    value=10000,
+    step=1000,
+    help="Maximum rows returned per query. Set to 0 to disable.",
+)
+
 # Display diagnostic information in sidebar expander
 with st.sidebar.expander("Connection Diagnostics"):
-    st.write("### System Information")
+    # Rendered as one markdown block rather than one element per line
     diagnostics = get_diagnostic_info()
-    for key, value in diagnostics.items():
-        st.write(f"**{key}:** {value}")
+    st.markdown("### System Information\n" + "\n".join(f"- **{key}:** {value}" for key, value in diagnostics.items()))
 
-# Test connection
-try:
-    with get_connection() as conn:
-        if conn:
-            connection_status.success("✅ Connected to Database")
-        else:
-            connection_status.error("❌ Failed to connect to Database")
-except Exception as e:
-    connection_status.error(f"❌ Connection Error: {str(e)}")
+# Test connection. The result is kept in session state and only re-probed
+# once a minute, so ordinary widget reruns do not touch the database.
+CONNECTION_CHECK_INTERVAL = 60
+if time.time() - st.session_state.get("db_checked_at", 0) > CONNECTION_CHECK_INTERVAL:
+    try:
+        with get_connection() as conn:
+            st.session_state.db_ok = conn is not None
+            st.session_state.db_error = None
+    except Exception as e:
+        st.session_state.db_ok = False
+        st.session_state.db_error = str(e)
+    st.session_state.db_checked_at = time.time()
+
+if st.session_state.db_error:
+    connection_status.error(f"❌ Connection Error: {st.session_state.db_error}")
+elif st.session_state.db_ok:
+    connection_status.success("✅ Connected to Database")
+    # Report the driver once per session
+    if not st.session_state.get("conn_logged"):
+        st.sidebar.success(f"Connected successfully. Driver version: {init_connection_pool().driver_ver}")
+        st.session_state.conn_logged = True
+else:
+    connection_status.error("❌ Failed to connect to Database")
 
 # Main content area
 st.subheader("Run SQL Query")
@@ -206,6 +591,20 @@ st.subheader("Run SQL Query")
 # Query input with default example
 default_query = "SELECT TOP 10 * FROM INFORMATION_SCHEMA.TABLES;"
 query = st.text_area("Enter SQL Query", value=default_query, height=150)
+param_text = st.text_input(
+    "Query parameters (optional)",
+    help="Comma-separated values for the ? placeholders in the query, in order. "
+         "Parameterized queries reuse prepared statements and cached results.",
+)
+query_params = tuple(value.strip() for value in param_text.split(",")) if param_text.strip() else None
+
+# Optional partitioned fetch for large result sets
+with st.expander("Parallel fetch (large result sets)"):
+    par_enabled = st.checkbox("Split the query into partitions fetched in parallel")
+    par_column = st.text_input("Integer partition column")
+    par_min = st.number_input("Lower bound (inclusive)", value=0, step=1)
+    par_max = st.number_input("Upper bound (inclusive)", value=1000000, step=1)
+    par_num = st.number_input("Number of partitions", min_value=1, max_value=16, value=4, step=1)
 
 # Execute button
 if st.button("Run Query"):
@@ -214,22 +613,40 @@ if st.button("Run Query"):
         start_time = time.time()
         
         # Run query
-        result = run_query(query)
+        if par_enabled and par_column.strip():
+            if par_min > par_max:
+                st.error("Parallel fetch: the lower bound must not be greater than the upper bound.")
+                result = pd.DataFrame()
+            else:
+                try:
+                    result = run_partitioned_query(
+                        query, query_params, par_column.strip(), int(par_min), int(par_max), int(par_num),
+                        row_limit=int(row_limit),
+                    )
+                except Exception as e:
+                    st.error(f"Parallel fetch failed: {str(e)}")
+                    result = pd.DataFrame()
+        else:
+            result = run_query(query, query_params, row_limit=int(row_limit))
         
         # Calculate execution time
         execution_time = time.time() - start_time
         
         # Display results
         if not result.empty:
+            # Encode the CSV in the background while the table is rendered
+            csv_future = get_executor().submit(to_csv_bytes, result)
+            
             st.success(f"Query executed successfully in {execution_time:.2f} seconds")
+            if row_limit and len(result) >= row_limit:
+                st.info(f"Results are limited to {int(row_limit)} rows. Adjust the row limit in the sidebar to see more.")
             st.subheader("Results")
             st.dataframe(result)
             
             # Show download button for results
-            csv = result.to_csv(index=False)
             st.download_button(
                 label="Download results as CSV",
-                data=csv,
+                data=csv_future.result(),
                 file_name="query_results.csv",
                 mime="text/csv",
             )
@@ -1,11 +1,18 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import io
 import time
-import pandas as pd
-import socket
-import platform
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from datetime import datetime
-import json
+import orjson
+# pandas, pyarrow, socket and platform are imported where they are used, so
+# they are not loaded until the first query or diagnostics render
+
+import query_cache
 
 # Title and description
 st.title("SQL Server Data Explorer (API Mode)")
@@ -21,97 +28,246 @@ API_CONFIG = {
     "API_PASSWORD": st.secrets.get("api", {}).get("password", "password"),
 }
 
-# Session state for authentication
-if "api_token" not in st.session_state:
-    st.session_state.api_token = None
-    st.session_state.token_expiry = None
+# Full endpoint URLs, built once instead of on every request
+API_ENDPOINTS = {
+    path: API_CONFIG["API_URL"].rstrip("/") + path
+    for path in ("/token", "/api/health", "/api/query", "/api/tables", "/api/database-info")
+}
+
+# The API token is shared by all sessions in this process, so new browser
+# tabs reuse it instead of authenticating again
+@st.cache_resource
+def get_token_holder():
+    """Process-wide API token and expiry, with a lock so only one session re-authenticates"""
+    return {"token": None, "auth_header": None, "expiry": 0, "lock": threading.Lock()}
+
+# Circuit breaker: after BREAKER_THRESHOLD consecutive request failures, fail
+# fast for BREAKER_COOLDOWN seconds instead of waiting on timeouts every rerun
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30
+if "breaker" not in st.session_state:
+    st.session_state.breaker = {"failures": 0, "opened_at": None}
+
+def breaker_allows_request():
+    """
+    Check the circuit breaker before calling the API. Once the cooldown is
+    over one request is let through as a probe; one more failure reopens it.
+    """
+    breaker = st.session_state.breaker
+    if breaker["opened_at"] is not None:
+        if time.time() - breaker["opened_at"] < BREAKER_COOLDOWN:
+            return False
+        breaker["opened_at"] = None
+        breaker["failures"] = BREAKER_THRESHOLD - 1
+    return True
+
+def record_api_success():
+    """Reset the circuit breaker after a successful API call"""
+    st.session_state.breaker["failures"] = 0
+
+def record_api_failure():
+    """Count a failed API call, opening the circuit breaker at the threshold"""
+    breaker = st.session_state.breaker
+    breaker["failures"] += 1
+    if breaker["failures"] >= BREAKER_THRESHOLD:
+        breaker["opened_at"] = time.time()
+
+# Query results can be sent as an Arrow IPC stream, which avoids building
+# the DataFrame row by row from JSON
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# (connect, read) timeouts in seconds: an unreachable host fails fast, while
+# reads keep a generous budget for slow queries
+API_TIMEOUTS = {
+    "token": (2, 10),
+    "data": (2, 30),
+    "health": (1, 3),
+}
+
+QUERY_HEADERS = {"Accept": f"{ARROW_STREAM_MEDIA_TYPE}, application/json"}
+
+# Retry transient failures with exponential backoff (0.5s, 1s, 2s, ...), honouring
+# Retry-After. Only failures that happen before the server runs anything are
+# retried: connection errors (once, so an unreachable host fails within a few
+# seconds) and 429/503 responses. Read timeouts and 502/504
+# are not, since the query may still be executing (or may have written data)
+# and resending it would run it again. 401s are handled in api_request since
+# they need a new token.
+HTTP_RETRY = Retry(
+    total=4,
+    connect=1,
+    read=0,
+    backoff_factor=0.5,
+    status_forcelist={429, 503},
+    allowed_methods={"GET", "POST"},
+    respect_retry_after_header=True,
+)
+
+# HTTP session with keep-alive connection pooling
+def get_http_session():
+    """
+    Return this user's HTTP session, creating it on first use. Reusing one
+    session keeps TCP/TLS connections to the API alive between requests.
+    """
+    if "http_session" not in st.session_state:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=20,
+            max_retries=HTTP_RETRY,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        st.session_state.http_session = session
+    return st.session_state.http_session
 
 # Diagnostic information for troubleshooting
-def get_diagnostic_info():
+@st.cache_resource
+def get_static_diagnostic_info():
     """
-    Collect diagnostic information about the environment.
+    Collect the parts of the diagnostic information that do not change while
+    the process runs.
     """
-    info = {
+    import platform
+    import socket
+    
+    return {
         "hostname": socket.gethostname(),
         "platform": platform.platform(),
         "python_version": platform.python_version(),
-        "timestamp": datetime.now().isoformat(),
     }
-    return info
+
+def get_diagnostic_info():
+    """
+    Collect diagnostic information about the environment.
+    """
+    return {**get_static_diagnostic_info(), "timestamp": datetime.now().isoformat()}
 
 # API Authentication
 def authenticate_api():
     """Authenticate with the API service and get access token"""
     try:
-        response = requests.post(
-            f"{API_CONFIG['API_URL']}/token",
+        response = get_http_session().post(
+            API_ENDPOINTS["/token"],
             data={
                 "username": API_CONFIG["API_USERNAME"],
                 "password": API_CONFIG["API_PASSWORD"],
             },
-            timeout=10,
+            timeout=API_TIMEOUTS["token"],
         )
         
         if response.status_code == 200:
+            record_api_success()
             token_data = response.json()
-            st.session_state.api_token = token_data["access_token"]
+            holder = get_token_holder()
+            holder["token"] = token_data["access_token"]
+            holder["auth_header"] = f"Bearer {token_data['access_token']}"
             # Token is valid for 30 minutes, but we'll refresh slightly earlier
-            st.session_state.token_expiry = time.time() + 25 * 60
+            holder["expiry"] = time.time() + 25 * 60
             return True
         else:
             st.error(f"Authentication failed: {response.text}")
             return False
     except requests.RequestException as e:
+        record_api_failure()
         st.error(f"API connection error: {str(e)}")
         return False
 
 # Get or refresh API token
 def get_api_token():
     """Get a valid API token, refreshing if necessary"""
-    if st.session_state.api_token is None or st.session_state.token_expiry is None or time.time() > st.session_state.token_expiry:
-        if not authenticate_api():
-            return None
-    return st.session_state.api_token
+    holder = get_token_holder()
+    if holder["token"] is None or time.time() > holder["expiry"]:
+        with holder["lock"]:
+            # Another session may have refreshed the token while we waited
+            if holder["token"] is None or time.time() > holder["expiry"]:
+                # Authentication goes through the circuit breaker like any other call
+                if not breaker_allows_request():
+                    return None
+                if not authenticate_api():
+                    return None
+    token = holder["token"]
+    get_http_session().headers["Authorization"] = holder["auth_header"]
+    return token
+
+# Pre-authenticate once per process
+@st.cache_resource(show_spinner=False)
+def warm_api_token():
+    """
+    Start fetching the shared API token in the background the first time the
+    app runs in this process, so authentication overlaps with rendering the
+    page. Sessions that need the token meanwhile wait on the holder's lock
+    instead of authenticating again.
+    """
+    thread = threading.Thread(target=get_api_token, daemon=True)
+    add_script_run_ctx(thread, get_script_run_ctx())
+    thread.start()
+    return thread
+
+warm_api_token()
 
 # Function to make authenticated API requests
-def api_request(endpoint, method="get", data=None, params=None):
+def decode_response(response):
+    """
+    Decode an API response. Arrow IPC bodies are returned as
+    {"columns": [...], "table": pyarrow.Table}, anything else as parsed JSON
+    (with orjson, which is much faster than response.json() on large results).
+    """
+    if response.headers.get("Content-Type", "").startswith(ARROW_STREAM_MEDIA_TYPE):
+        import pyarrow as pa
+        
+        table = pa.ipc.open_stream(response.content).read_all()
+        return {"columns": table.column_names, "table": table}
+    return orjson.loads(response.content)
+
+def api_request(endpoint, method="get", data=None, params=None, headers=None):
     """Make authenticated request to the API"""
+    if not breaker_allows_request():
+        st.warning("API circuit open: skipping request while the API recovers")
+        return None
+    
     token = get_api_token()
     if token is None:
         st.error("Authentication failed. Unable to make API request.")
         return None
     
-    headers = {"Authorization": f"Bearer {token}"}
+    # The session carries the Authorization header set by get_api_token
+    session = get_http_session()
     
     try:
-        url = f"{API_CONFIG['API_URL']}{endpoint}"
+        url = API_ENDPOINTS[endpoint]
         
         if method.lower() == "get":
-            response = requests.get(url, headers=headers, params=params, timeout=30)
+            response = session.get(url, params=params, headers=headers, timeout=API_TIMEOUTS["data"])
         elif method.lower() == "post":
-            response = requests.post(url, headers=headers, json=data, timeout=30)
+            response = session.post(url, json=data, headers=headers, timeout=API_TIMEOUTS["data"])
         else:
             st.error(f"Unsupported HTTP method: {method}")
             return None
         
         if response.status_code == 200:
-            return response.json()
+            record_api_success()
+            return decode_response(response)
         elif response.status_code == 401:
             # Token might have expired, try re-authenticating once
-            st.session_state.api_token = None
+            holder = get_token_holder()
+            with holder["lock"]:
+                # Only drop the token if no other session has replaced it already
+                if holder["token"] == token:
+                    holder["token"] = None
             token = get_api_token()
             if token is None:
                 return None
                 
             # Retry with new token
-            headers = {"Authorization": f"Bearer {token}"}
             if method.lower() == "get":
-                response = requests.get(url, headers=headers, params=params, timeout=30)
+                response = session.get(url, params=params, headers=headers, timeout=API_TIMEOUTS["data"])
             else:
-                response = requests.post(url, headers=headers, json=data, timeout=30)
+                response = session.post(url, json=data, headers=headers, timeout=API_TIMEOUTS["data"])
                 
             if response.status_code == 200:
-                return response.json()
+                record_api_success()
+                return decode_response(response)
             else:
                 st.error(f"API request failed: {response.text}")
                 return None
@@ -119,34 +275,60 @@ def api_request(endpoint, method="get", data=None, params=None):
             st.error(f"API request failed: {response.text}")
             return None
     except requests.RequestException as e:
+        record_api_failure()
         st.error(f"API request error: {str(e)}")
         return None
+    except orjson.JSONDecodeError as e:
+        # e.g. an HTML error page from a proxy in front of the API
+        st.error(f"API returned an invalid response: {str(e)}")
+        return None
 
-# Run query using the API
-@st.cache_data(ttl=600)  # Cache for 10 minutes
-def run_query(query):
+# How long query results are served before being refreshed in the background.
+# Results older than QUERY_CACHE_MAX_STALE are not served at all; the query is
+# run again and the caller waits for it.
+QUERY_CACHE_TTL = 600
+QUERY_CACHE_MAX_STALE = 2 * QUERY_CACHE_TTL
+QUERY_CACHE_MAX_ENTRIES = 256
+
+def disk_cache_key(query):
+    """Disk cache key for a query's result, covering the API it ran against"""
+    return API_CONFIG["API_URL"] + query
+
+@st.cache_resource
+def get_query_cache():
     """
-    Execute a SQL query through the API and return the results as a pandas DataFrame.
-    
-    Args:
-        query (str): SQL query to execute
-        
-    Returns:
-        pandas.DataFrame: Query results
+    Process-wide store of query results, keyed by query text. Each entry holds
+    the DataFrame, the time it was fetched and a lock that dedupes background refreshes.
+    """
+    return {}
+
+def fetch_query(query):
+    """
+    Execute a SQL query through the API and return the results as a pandas DataFrame,
+    or None if the request failed.
     """
+    import pandas as pd
+    
     try:
         # Prepare the request payload
         data = {"query": query, "params": None}
         
         # Make API call
-        result = api_request("/api/query", method="post", data=data)
+        result = api_request(
+            "/api/query",
+            method="post",
+            data=data,
+            headers=QUERY_HEADERS,
+        )
         
         if result is None:
-            return pd.DataFrame()
+            return None
         
         # Convert API result to DataFrame
+        if "table" in result:
+            return result["table"].to_pandas()
         if len(result.get("columns", [])) > 0 and len(result.get("data", [])) > 0:
-            df = pd.DataFrame(result["data"], columns=result["columns"])
+            df = pd.DataFrame.from_records(result["data"], columns=result["columns"])
             return df
         else:
             # Empty result set but successful query
@@ -155,64 +337,252 @@ def run_query(query):
             return pd.DataFrame()
     except Exception as e:
         st.error(f"Error processing query: {str(e)}")
-        return pd.DataFrame()
+        return None
+
+@st.cache_resource
+def get_inflight_queries():
+    """Queries currently being fetched by some session, keyed by query text"""
+    return {"lock": threading.Lock(), "calls": {}}
+
+def fetch_query_coalesced(query):
+    """
+    Fetch a query with fetch_query, sharing one API call between sessions that
+    request the same query at the same time. Later callers wait for the first
+    one to finish and receive its result.
+    """
+    inflight = get_inflight_queries()
+    with inflight["lock"]:
+        call = inflight["calls"].get(query)
+        is_leader = call is None
+        if is_leader:
+            call = {"event": threading.Event(), "df": None}
+            inflight["calls"][query] = call
+    
+    if not is_leader:
+        call["event"].wait()
+        return call["df"]
+    
+    try:
+        call["df"] = fetch_query(query)
+    finally:
+        with inflight["lock"]:
+            inflight["calls"].pop(query, None)
+        call["event"].set()
+    return call["df"]
+
+def refresh_query(query, entry):
+    """Re-run a query in the background and write the result back into its cache entry"""
+    try:
+        df = fetch_query(query)
+        if df is not None:
+            entry["df"] = df
+            entry["fetched_at"] = time.time()
+            query_cache.save_result(disk_cache_key(query), df)
+    except Exception:
+        # The script run that started the refresh may have finished; keep serving the stale result
+        pass
+    finally:
+        entry["lock"].release()
+
+# Run query through the result cache
+def get_query_result(query):
+    """
+    Execute a SQL query through the API, using the result cache.
+    
+    Results are cached for QUERY_CACHE_TTL seconds. Once expired, the stale
+    result is returned immediately while a background thread refreshes it,
+    as long as it is no older than QUERY_CACHE_MAX_STALE; older results are
+    fetched again before returning. Results are also kept on disk, so after
+    a restart recent results are served from there.
+    
+    Args:
+        query (str): SQL query to execute
+        
+    Returns:
+        tuple: (pandas.DataFrame, fetched_at) where fetched_at is the time the
+        result was fetched from the API, or None if the request failed
+    """
+    import pandas as pd
+    
+    cache = get_query_cache()
+    entry = cache.get(query)
+    
+    if entry is None:
+        # Results are also persisted on disk so they survive restarts and deploys
+        cached = query_cache.load_result(disk_cache_key(query), QUERY_CACHE_MAX_STALE)
+        if cached is not None:
+            df, saved_at = cached
+            entry = {"df": df, "fetched_at": saved_at, "lock": threading.Lock()}
+    
+    if entry is None or time.time() - entry["fetched_at"] > QUERY_CACHE_MAX_STALE:
+        df = fetch_query_coalesced(query)
+        if df is None:
+            return pd.DataFrame(), None
+        query_cache.save_result(disk_cache_key(query), df)
+        entry = {"df": df, "fetched_at": time.time(), "lock": threading.Lock()}
+    
+    if cache.get(query) is not entry:
+        if query not in cache and len(cache) >= QUERY_CACHE_MAX_ENTRIES:
+            cache.pop(next(iter(cache)), None)
+        cache[query] = entry
+    
+    # Serve the stale result and refresh it unless another session already is
+    if time.time() - entry["fetched_at"] > QUERY_CACHE_TTL and entry["lock"].acquire(blocking=False):
+        thread = threading.Thread(target=refresh_query, args=(query, entry), daemon=True)
+        add_script_run_ctx(thread, get_script_run_ctx())
+        thread.start()
+    return entry["df"], entry["fetched_at"]
+
+# Run query using the API
+def run_query(query):
+    """
+    Execute a SQL query through the API and return the results as a pandas DataFrame.
+    Results may come from the cache, see get_query_result.
+    
+    Args:
+        query (str): SQL query to execute
+        
+    Returns:
+        pandas.DataFrame: Query results
+    """
+    return get_query_result(query)[0]
+
+class APIError(Exception):
+    """Raised by cached lookups when the API call fails, so failures are not cached"""
 
 # Get database information using the API
+@st.cache_data(ttl=600, show_spinner=False)  # Cache for 10 minutes
 def get_database_info():
     """Retrieve database information from API"""
-    return api_request("/api/database-info")
+    db_info = api_request("/api/database-info")
+    if not db_info or not db_info.get("data"):
+        raise APIError("Failed to retrieve database information")
+    return db_info
 
 # Get tables using the API
+@st.cache_data(ttl=600, show_spinner=False)  # Cache for 10 minutes
 def get_tables():
-    """Retrieve tables from the database"""
-    return api_request("/api/tables")
+    """Retrieve tables from the database as a DataFrame"""
+    import pandas as pd
+    
+    tables_result = api_request("/api/tables")
+    if not tables_result or "data" not in tables_result:
+        raise APIError("Failed to retrieve tables")
+    return pd.DataFrame.from_records(tables_result["data"], columns=tables_result["columns"])
 
-# Connection status indicator
-connection_status = st.sidebar.empty()
-diagnostics_expander = st.sidebar.expander("Connection Diagnostics")
+@st.cache_data(ttl=600, show_spinner=False)  # Cache for 10 minutes
+def get_tables_by_schema():
+    """Map each schema to the names of its tables, so selections are dict lookups"""
+    tables_df = get_tables()
+    schema_column, table_column = tables_df.columns[0], tables_df.columns[1]
+    return {
+        schema: group[table_column].tolist()
+        for schema, group in tables_df.groupby(schema_column, sort=False)
+    }
+
+def or_none(func):
+    """Call a cached lookup, returning None instead of raising APIError"""
+    try:
+        return func()
+    except APIError:
+        return None
 
-with diagnostics_expander:
-    st.write("### System Information")
-    diagnostics = get_diagnostic_info()
-    for key, value in diagnostics.items():
-        st.write(f"**{key}:** {value}")
+# Encode query results for download
+@st.cache_data(show_spinner=False, max_entries=8)
+def encode_result(result_key, _df, fmt):
+    """
+    Encode a result DataFrame as Parquet or CSV bytes. Cached on result_key
+    so the DataFrame itself is not hashed on every rerun. Returns None if the
+    result cannot be written as Parquet.
+    """
+    import pyarrow as pa
     
-    # Add API connectivity test button
-    if st.button("Test API Connectivity"):
+    buf = io.BytesIO()
+    if fmt == "parquet":
         try:
-            health_response = requests.get(f"{API_CONFIG['API_URL']}/api/health", timeout=5)
-            if health_response.status_code == 200:
-                st.success("✅ API health check successful")
-                st.json(health_response.json())
+            _df.to_parquet(buf, engine="pyarrow", compression="zstd", index=False)
+        except (pa.ArrowException, TypeError, ValueError):
+            return None
+    else:
+        _df.to_csv(buf, index=False)
+    return buf.getvalue()
+
+# Connection status indicator
+connection_status = st.sidebar.empty()
+
+# Diagnostics run as a fragment, so clicking its buttons only reruns this
+# panel instead of the whole page
+@st.fragment
+def render_diagnostics():
+    """Render the connection diagnostics panel"""
+    with st.expander("Connection Diagnostics"):
+        # Rendered as one markdown block rather than one element per line
+        diagnostics = get_diagnostic_info()
+        st.markdown("### System Information\n" + "\n".join(f"- **{key}:** {value}" for key, value in diagnostics.items()))
+        
+        # Add API connectivity test button
+        if st.button("Test API Connectivity"):
+            try:
+                health_response = get_http_session().get(API_ENDPOINTS["/api/health"], timeout=API_TIMEOUTS["health"])
+                if health_response.status_code == 200:
+                    st.success("✅ API health check successful")
+                    st.json(health_response.json())
+                else:
+                    st.error(f"❌ API health check failed: {health_response.status_code}")
+            except Exception as e:
+                st.error(f"❌ API connection failed: {str(e)}")
+        
+        # Add database info button
+        if st.button("Database Information"):
+            db_info = or_none(get_database_info)
+            if db_info:
+                st.success("✅ Database information retrieved successfully")
+                info = {
+                    "Server": db_info["data"][0][0],
+                    "Database": db_info["data"][0][1],
+                    "SQL Version": db_info["data"][0][2][:50] + "..." if len(db_info["data"][0][2]) > 50 else db_info["data"][0][2],
+                    "Product Version": db_info["data"][0][3],
+                }
+                st.json(info)
             else:
-                st.error(f"❌ API health check failed: {health_response.status_code}")
-        except Exception as e:
-            st.error(f"❌ API connection failed: {str(e)}")
+                st.error("❌ Failed to retrieve database information")
+
+with st.sidebar:
+    render_diagnostics()
+
+def run_in_parallel(*funcs):
+    """
+    Run independent API calls concurrently and return their results in order.
+    Worker threads get this script run's context so they can use
+    st.session_state and report errors.
+    """
+    ctx = get_script_run_ctx()
     
-    # Add database info button
-    if st.button("Database Information"):
-        db_info = get_database_info()
-        if db_info and "data" in db_info and len(db_info["data"]) > 0:
-            st.success("✅ Database information retrieved successfully")
-            info = {
-                "Server": db_info["data"][0][0],
-                "Database": db_info["data"][0][1],
-                "SQL Version": db_info["data"][0][2][:50] + "..." if len(db_info["data"][0][2]) > 50 else db_info["data"][0][2],
-                "Product Version": db_info["data"][0][3],
-            }
-            st.json(info)
-        else:
-            st.error("❌ Failed to retrieve database information")
+    def call(func):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return func()
+    
+    with ThreadPoolExecutor(max_workers=len(funcs)) as executor:
+        futures = [executor.submit(call, func) for func in funcs]
+        return [future.result() for future in futures]
 
 # Initial authentication and connectivity check
 try:
     # Try to authenticate with API
     token = get_api_token()
     if token:
-        # Check database connectivity by getting tables
-        tables_result = get_tables()
-        if tables_result and "columns" in tables_result:
-            connection_status.success("✅ Connected to API and Database")
+        # Check database connectivity by getting tables, fetching the database
+        # details at the same time
+        tables_df, db_info = run_in_parallel(
+            lambda: or_none(get_tables),
+            lambda: or_none(get_database_info),
+        )
+        if tables_df is not None:
+            if db_info:
+                server, database = db_info["data"][0][0], db_info["data"][0][1]
+                connection_status.success(f"✅ Connected to API and Database ({server}/{database})")
+            else:
+                connection_status.success("✅ Connected to API and Database")
         else:
             connection_status.warning("✅ Connected to API but database access failed")
     else:
@@ -232,43 +602,87 @@ if st.button("Run Query"):
         start_time = time.time()
         
         # Run query
-        result = run_query(query)
+        result, fetched_at = get_query_result(query)
         
         # Calculate execution time
         execution_time = time.time() - start_time
         
-        # Display results
-        if not result.empty:
-            st.success(f"Query executed successfully in {execution_time:.2f} seconds")
-            st.subheader("Results")
-            st.dataframe(result)
-            
-            # Show download button for results
-            csv = result.to_csv(index=False)
-            st.download_button(
-                label="Download results as CSV",
-                data=csv,
-                file_name="query_results.csv",
-                mime="text/csv",
-            )
+        # Keep the result so it survives the reruns triggered by the download widgets
+        st.session_state.last_result = {
+            "df": result,
+            "execution_time": execution_time,
+            # Age of the result when it was served, if it came from the cache
+            "cache_age": start_time - fetched_at if fetched_at and fetched_at < start_time else None,
+            "key": time.time_ns(),
+        }
+
+# Display results
+last_result = st.session_state.get("last_result")
+if last_result is not None:
+    result = last_result["df"]
+    if not result.empty:
+        if last_result["cache_age"] is None:
+            st.success(f"Query executed successfully in {last_result['execution_time']:.2f} seconds")
         else:
-            st.warning("No results returned or an error occurred")
-
-# Show tables section
-with st.expander("Browse Tables"):
-    if st.button("Refresh Tables"):
-        tables_result = get_tables()
-        if tables_result and "data" in tables_result:
-            tables_df = pd.DataFrame(tables_result["data"], columns=tables_result["columns"])
+            cache_age = last_result["cache_age"]
+            age_text = f"{cache_age:.0f} seconds" if cache_age < 120 else f"{cache_age / 60:.0f} minutes"
+            st.success(
+                f"Showing cached results from {age_text} ago "
+                f"(loaded in {last_result['execution_time']:.2f} seconds)"
+            )
+        st.subheader("Results")
+        st.dataframe(result)
+        
+        # Show download buttons for results. Parquet is compact and quick to
+        # write, so it is offered directly; CSV is only encoded on request.
+        parquet_col, csv_col = st.columns(2)
+        with parquet_col:
+            parquet = encode_result(last_result["key"], result, "parquet")
+            if parquet is not None:
+                st.download_button(
+                    label="Download results as Parquet",
+                    data=parquet,
+                    file_name="query_results.parquet",
+                    mime="application/vnd.apache.parquet",
+                )
+        with csv_col:
+            if st.checkbox("Prepare CSV download"):
+                st.download_button(
+                    label="Download results as CSV",
+                    data=encode_result(last_result["key"], result, "csv"),
+                    file_name="query_results.csv",
+                    mime="text/csv",
+                )
+    else:
+        st.warning("No results returned or an error occurred")
+
+# Show tables section. Runs as a fragment, so picking a schema or table only
+# reruns this section instead of the whole page
+@st.fragment
+def browse_tables():
+    """Render the table browser"""
+    with st.expander("Browse Tables"):
+        if st.button("Refresh Tables"):
+            # Refreshing bypasses the cache so newly created tables show up
+            get_tables.clear()
+            get_tables_by_schema.clear()
+            # Remember the click, since the button is reset on the next rerun
+            st.session_state.tables_loaded = True
+        
+        if not st.session_state.get("tables_loaded"):
+            return
+        
+        tables_df = or_none(get_tables)
+        tables_by_schema = or_none(get_tables_by_schema)
+        if tables_df is not None and tables_by_schema is not None:
             st.dataframe(tables_df)
             
             # Allow selecting and querying a table
-            schemas = tables_df[tables_result["columns"][0]].unique().tolist()
-            selected_schema = st.selectbox("Select Schema", schemas)
+            selected_schema = st.selectbox("Select Schema", list(tables_by_schema))
             
-            filtered_tables = tables_df[tables_df[tables_result["columns"][0]] == selected_schema]
-            if not filtered_tables.empty:
-                selected_table = st.selectbox("Select Table", filtered_tables[tables_result["columns"][1]].tolist())
+            filtered_tables = tables_by_schema.get(selected_schema, [])
+            if filtered_tables:
+                selected_table = st.selectbox("Select Table", filtered_tables)
                 
                 if st.button(f"Query {selected_schema}.{selected_table}"):
                     sample_query = f"SELECT TOP 100 * FROM {selected_schema}.{selected_table}"
@@ -282,6 +696,8 @@ with st.expander("Browse Tables"):
         else:
             st.error("Failed to retrieve tables")
 
+browse_tables()
+
 # Footer
 st.markdown("---")
 st.markdown("Created with Streamlit and SQL Server API Proxy")
@@ -0,0 +1,39 @@
+import hashlib
+import os
+import time
+
+# Directory for query results persisted across restarts and replicas
+QUERY_CACHE_DIR = os.path.join(".streamlit", "query_cache")
+
+def cache_path(key):
+    """Parquet file holding the cached result for a cache key"""
+    return os.path.join(QUERY_CACHE_DIR, hashlib.sha224(key.encode()).hexdigest() + ".parquet")
+
+def load_result(key, max_age, **read_options):
+    """
+    Return (DataFrame, saved_at) for a cache key, or None if there is no file
+    or it is older than max_age seconds. Extra keyword arguments are passed
+    to pandas.read_parquet. Cache errors are never fatal.
+    """
+    # Imported here so apps that load pandas lazily do not pay for it up front
+    import pandas as pd
+    
+    path = cache_path(key)
+    try:
+        saved_at = os.path.getmtime(path)
+        if saved_at > time.time() - max_age:
+            return pd.read_parquet(path, **read_options), saved_at
+    except (OSError, ValueError):
+        pass
+    return None
+
+def save_result(key, df):
+    """Persist a result DataFrame for a cache key. Cache errors are never fatal."""
+    # Empty frames are also returned on errors, so never persist them
+    if df.empty:
+        return
+    try:
+        os.makedirs(QUERY_CACHE_DIR, exist_ok=True)
+        df.to_parquet(cache_path(key), index=False)
+    except Exception:
+        pass